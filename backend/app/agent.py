@@ -1,20 +1,33 @@
 """LangGraph agent with MultiMCP support using langchain-mcp-adapters."""
 
-import json
+import asyncio
+import contextlib
+import functools
+import inspect
+import itertools
 import logging
-from typing import Any, AsyncGenerator
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+import orjson
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, SystemMessage
+from langchain_core.tools import BaseTool
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp import ClientSession
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 
 from app.schemas import ChatMessage, MCPType
 
 
+# Message class for each supported conversation history role
+_ROLE_CLS: dict[str, type[BaseMessage]] = {"user": HumanMessage, "assistant": AIMessage}
+
+
 def get_mcp_server_config(
     selected_mcps: list[MCPType],
     filesystem_path: str = "/Users/mohitpaddhariya"
@@ -27,7 +40,7 @@ def get_mcp_server_config(
     Available MCP Servers:
     - filesystem: Local filesystem operations (read, write, list files)
     """
-    logger.info(f"[get_mcp_server_config] Building config for: {selected_mcps}")
+    logger.info("[get_mcp_server_config] Building config for: %s", selected_mcps)
     config = {}
     
     for mcp_type in selected_mcps:
@@ -46,14 +59,359 @@ def get_mcp_server_config(
     return config
 
 
+def _get_system_prompt(selected_mcps: list[MCPType], available_tools: list[str] | None = None) -> str:
+    """Get system prompt based on available tools."""
+    if selected_mcps and available_tools:
+        tools_info = ", ".join(available_tools) if available_tools else "none"
+        mcps_info = ", ".join([mcp.value for mcp in selected_mcps])
+        return (
+            f"You currently have access to the following MCP servers: {mcps_info}. "
+            f"Available tools: {tools_info}. "
+            "IMPORTANT: Ignore any previous messages in the conversation history that say you don't have access to tools - "
+            "your tool access has been updated for this request. You DO have tools available now. "
+            "You can access the user's local files under /Users/mohitpaddhariya using filesystem tools (e.g., read_file, list_directory). "
+            "Do not say you cannot access local files; instead, invoke the appropriate tool. "
+            "Use the tools available to you to help the user with their request."
+        )
+    else:
+        return (
+            "You currently do not have access to any external tools or MCP servers. "
+            "If the user asks you to perform actions that require tools (like reading files, listing directories, etc.), "
+            "politely explain that no tools are currently selected and suggest they select the appropriate MCP tools from the sidebar."
+        )
+
+
+@functools.lru_cache(maxsize=32)
+def _system_prompt_for(selected_key: frozenset[MCPType], tools_key: frozenset[str]) -> str:
+    """Get the (cached) system prompt for a selected-MCP and tool-name set."""
+    return _get_system_prompt(sorted(selected_key), sorted(tools_key))
+
+
+def _run_in_thread(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """
+    Wrap a sync tool callable so it runs in a worker thread.
+    
+    Exceptions propagate unchanged, so handle_tool_error still turns a
+    ToolException into a tool result and real bugs still surface.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+
+def _prepare_tools(tools: list[BaseTool]) -> None:
+    """
+    Enable error handling for all tools and keep sync ones off the event loop.
+    
+    A tool with only a sync callable would otherwise block the event loop,
+    and with it every concurrent stream, while it runs.
+    """
+    for tool in tools:
+        tool.handle_tool_error = True
+        func = getattr(tool, "func", None)
+        if (
+            func is not None
+            and getattr(tool, "coroutine", None) is None
+            and not inspect.iscoroutinefunction(func)
+        ):
+            tool.coroutine = _run_in_thread(func)
+
+
+def _preview(obj: Any, n: int = 500, max_items: int = 20) -> str:
+    """
+    Short string preview of a possibly large tool output.
+    
+    Only the first `max_items` entries of a list/dict are stringified, so a
+    huge directory listing is never rendered in full just to be truncated.
+    """
+    if isinstance(obj, BaseMessage):
+        obj = obj.content
+    if isinstance(obj, (list, tuple)) and len(obj) > max_items:
+        obj = [*itertools.islice(obj, max_items), "..."]
+    elif isinstance(obj, dict) and len(obj) > max_items:
+        obj = dict(itertools.islice(obj.items(), max_items))
+    s = obj if isinstance(obj, str) else str(obj)
+    return s if len(s) <= n else s[:n] + "…"
+
+
+def _add_usage(usage: dict[str, int], message: Any) -> None:
+    """Add a message's token usage metadata (if any) to the running totals."""
+    metadata = getattr(message, "usage_metadata", None)
+    if metadata:
+        usage["input_tokens"] += metadata.get("input_tokens", 0)
+        usage["output_tokens"] += metadata.get("output_tokens", 0)
+
+
+# MCP tools cached per selected-MCP set so the stdio subprocess spawn +
+# handshake in get_tools() is paid only once. Tools loaded this way open a
+# session per call, so the client itself does not need to be kept.
+_TOOLS_CACHE: dict[frozenset[MCPType], list[BaseTool]] = {}
+_TOOLS_LOCKS: dict[frozenset[MCPType], asyncio.Lock] = {}
+
+
+async def get_mcp_tools(
+    selected_mcps: list[MCPType],
+    mcp_config: dict[str, dict]
+) -> list[BaseTool]:
+    """
+    Get tools for the selected MCPs, loading them once per MCP set.
+    
+    Each MCP set has its own lock, so concurrent misses for the same set
+    share one load while different sets load in parallel. Failed loads are
+    not cached.
+    """
+    key = frozenset(selected_mcps)
+    if key in _TOOLS_CACHE:
+        return _TOOLS_CACHE[key]
+    
+    async with _TOOLS_LOCKS.setdefault(key, asyncio.Lock()):
+        if key in _TOOLS_CACHE:
+            return _TOOLS_CACHE[key]
+        
+        logger.info("[get_mcp_tools] Cache miss for: %s", selected_mcps)
+        tools = await MultiServerMCPClient(mcp_config).get_tools()
+        _prepare_tools(tools)
+        _TOOLS_CACHE[key] = tools
+        return tools
+
+
+class PersistentMCPClient:
+    """
+    MultiServerMCPClient that keeps one stdio session open per MCP server.
+    
+    Call connect() once at startup and disconnect() at shutdown. Each session
+    is held open by its own task, since the stdio transport must be entered
+    and exited from the same task. The task pings its server every
+    `heartbeat_interval` seconds; when a server stops answering, its tools are
+    withdrawn (so callers fall back to per-call sessions) and the session is
+    reopened after `reconnect_delay` seconds. connect() waits at most
+    `connect_timeout` seconds per server; a slow server keeps connecting in
+    the background and its tools are published once it is up.
+    """
+    
+    def __init__(
+        self,
+        mcp_types: list[MCPType],
+        heartbeat_interval: float = 10.0,
+        reconnect_delay: float = 5.0,
+        connect_timeout: float = 30.0,
+        shutdown_timeout: float = 5.0
+    ):
+        """Initialize the client for the given MCP servers (not yet connected)."""
+        self.mcp_types = list(mcp_types)
+        self.heartbeat_interval = heartbeat_interval
+        self.reconnect_delay = reconnect_delay
+        self.connect_timeout = connect_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.client = MultiServerMCPClient(get_mcp_server_config(self.mcp_types))
+        self._tools: dict[MCPType, list[BaseTool]] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._closing = asyncio.Event()
+    
+    async def _watch(self, session: ClientSession) -> None:
+        """Return on disconnect(); raise once the server stops answering pings."""
+        while True:
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.heartbeat_interval)
+                return
+            except asyncio.TimeoutError:
+                await asyncio.wait_for(session.send_ping(), self.heartbeat_interval)
+    
+    async def _hold_session(self, mcp_type: MCPType, ready: asyncio.Future) -> None:
+        """Keep a session open and its tools published until disconnect()."""
+        connected = False
+        while not self._closing.is_set():
+            try:
+                async with self.client.session(mcp_type.value) as session:
+                    tools = await load_mcp_tools(session)
+                    _prepare_tools(tools)
+                    self._tools[mcp_type] = tools
+                    connected = True
+                    logger.info("[PersistentMCPClient] Connected %s (%d tools)", mcp_type.value, len(tools))
+                    if not ready.done():
+                        ready.set_result(tools)
+                    await self._watch(session)
+            except Exception as e:
+                if not connected:
+                    # Never came up - leave requests to the per-call fallback
+                    if not ready.done():
+                        ready.set_exception(e)
+                    else:
+                        logger.error("[PersistentMCPClient] Failed to connect %s: %s", mcp_type.value, e)
+                    return
+                logger.error("[PersistentMCPClient] Session for %s closed: %s", mcp_type.value, e)
+            finally:
+                self._tools.pop(mcp_type, None)
+            
+            # Wait before reconnecting, unless shutting down
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.reconnect_delay)
+            except asyncio.TimeoutError:
+                logger.info("[PersistentMCPClient] Reconnecting %s...", mcp_type.value)
+    
+    async def connect_server(self, mcp_type: MCPType) -> list[BaseTool]:
+        """Spawn an MCP server, keep its session open and return its tools."""
+        ready = asyncio.get_running_loop().create_future()
+        self._tasks.append(asyncio.create_task(self._hold_session(mcp_type, ready)))
+        return await ready
+    
+    async def connect(self) -> None:
+        """Connect to every configured MCP server in parallel, logging any that fail or time out."""
+        results = await asyncio.gather(
+            *[
+                asyncio.wait_for(self.connect_server(mcp_type), self.connect_timeout)
+                for mcp_type in self.mcp_types
+            ],
+            return_exceptions=True
+        )
+        for mcp_type, result in zip(self.mcp_types, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.error(
+                    "[PersistentMCPClient] %s not ready after %.0fs, still connecting in the background",
+                    mcp_type.value, self.connect_timeout
+                )
+            elif isinstance(result, Exception):
+                logger.error("[PersistentMCPClient] Failed to connect %s: %s", mcp_type.value, result)
+    
+    async def disconnect(self) -> None:
+        """Close all open sessions and stop the MCP server subprocesses."""
+        self._closing.set()
+        if self._tasks:
+            # Sessions still stuck connecting never see _closing - cancel them
+            _, pending = await asyncio.wait(self._tasks, timeout=self.shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._tools.clear()
+    
+    def get_tools(self, selected_mcps: list[MCPType]) -> list[BaseTool] | None:
+        """Get session-bound tools, or None if a selected server is not connected."""
+        if not all(mcp_type in self._tools for mcp_type in selected_mcps):
+            return None
+        return [tool for mcp_type in selected_mcps for tool in self._tools[mcp_type]]
+
+
+class _TokenBuffer:
+    """
+    Coalesces streamed token chunks into fewer, larger token events.
+    
+    A buffer is flushed once it holds `max_chars` characters or `max_delay`
+    seconds have passed since the last flush. Used with _with_flush_deadline,
+    which flushes on that deadline even when no further chunk arrives, so
+    buffered text is delayed by at most `max_delay`.
+    """
+    
+    def __init__(self, max_chars: int = 64, max_delay: float = 0.015):
+        """Initialize an empty buffer."""
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self._loop = asyncio.get_running_loop()
+        self._parts: list[str] = []
+        self._size = 0
+        self._last_flush = self._loop.time()
+    
+    def add(self, content: str) -> str | None:
+        """Buffer a chunk, returning the coalesced text if it is time to flush."""
+        self._parts.append(content)
+        self._size += len(content)
+        if self._size >= self.max_chars or self._loop.time() - self._last_flush > self.max_delay:
+            return self.flush()
+        return None
+    
+    def time_left(self) -> float | None:
+        """Seconds until the buffered text is due, or None if the buffer is empty."""
+        if not self._parts:
+            return None
+        return max(0.0, self._last_flush + self.max_delay - self._loop.time())
+    
+    def flush(self) -> str | None:
+        """Return and clear the buffered text, or None if it is empty."""
+        self._last_flush = self._loop.time()
+        if not self._parts:
+            return None
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        return text
+
+
+# Yielded by _with_flush_deadline when buffered tokens are due
+_FLUSH = object()
+
+
+async def _with_flush_deadline(
+    source: AsyncIterator[Any],
+    buffer: _TokenBuffer
+) -> AsyncGenerator[Any, None]:
+    """
+    Iterate `source`, yielding _FLUSH whenever the buffered text is due.
+    
+    The source is consumed by its own task, so waiting for its next item
+    with a timeout never interrupts it; the task is cancelled when iteration
+    stops (e.g. the client disconnects). If the source raises, a final _FLUSH
+    is yielded before the error is re-raised.
+    """
+    queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+    
+    async def pump() -> None:
+        try:
+            async with contextlib.aclosing(source) as items:
+                async for item in items:
+                    await queue.put(("item", item))
+        except Exception as e:
+            await queue.put(("error", e))
+        else:
+            await queue.put(("done", None))
+    
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                kind, value = await asyncio.wait_for(queue.get(), buffer.time_left())
+            except asyncio.TimeoutError:
+                yield _FLUSH
+                continue
+            if kind == "item":
+                yield value
+            elif kind == "error":
+                # Let the caller send text it already buffered before the error surfaces
+                yield _FLUSH
+                raise value
+            else:
+                return
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
 class MCPAgentBuilder:
-    """Builds LangGraph agents with MultiMCP support."""
+    """
+    Builds LangGraph agents with MultiMCP support.
+    
+    Safe to share across requests: per-request state lives only in the
+    arguments to run_agent/stream_agent, so one instance (and its LLM
+    client) is created at startup and reused.
+    """
     
-    def __init__(self, model_name: str, google_api_key: str):
+    def __init__(
+        self,
+        model_name: str,
+        google_api_key: str,
+        mcp_client: PersistentMCPClient | None = None
+    ):
         """Initialize the agent builder."""
-        logger.info(f"[MCPAgentBuilder] Initializing with model: {model_name}")
+        logger.info("[MCPAgentBuilder] Initializing with model: %s", model_name)
         self.model_name = model_name
         self.google_api_key = google_api_key
+        self.mcp_client = mcp_client
+        
+        # Compiled ReAct agents keyed by (model name, tool names). The tools
+        # each agent was built with are kept alongside it so a reconnected MCP
+        # session (new tool objects with the same names) triggers a rebuild.
+        self._agent_cache: dict[tuple[str, frozenset[str]], tuple[list[BaseTool], CompiledStateGraph]] = {}
+        self._agent_cache_lock = asyncio.Lock()
         
         # Create the LLM
         self.llm = ChatGoogleGenerativeAI(
@@ -63,100 +421,100 @@ class MCPAgentBuilder:
         )
         logger.info("[MCPAgentBuilder] LLM initialized")
     
+    async def _load_tools(
+        self,
+        selected_mcps: list[MCPType],
+        mcp_config: dict[str, dict]
+    ) -> list[BaseTool]:
+        """Get tools from the persistent client, falling back to the tool cache."""
+        if self.mcp_client is not None:
+            tools = self.mcp_client.get_tools(selected_mcps)
+            if tools is not None:
+                return tools
+        return await get_mcp_tools(selected_mcps, mcp_config)
+    
+    async def _get_agent(self, tools: list[BaseTool]) -> CompiledStateGraph:
+        """Get a cached ReAct agent for these tools, building it on a miss."""
+        key = (self.model_name, frozenset(tool.name for tool in tools))
+        
+        async with self._agent_cache_lock:
+            cached = self._agent_cache.get(key)
+            if cached is not None and {id(t) for t in cached[0]} == {id(t) for t in tools}:
+                return cached[1]
+            
+            logger.info("[_get_agent] Creating ReAct agent for %d tools...", len(tools))
+            agent = create_react_agent(
+                model=self.llm,
+                tools=tools,
+            )
+            self._agent_cache[key] = (tools, agent)
+            return agent
+    
     def _build_messages(
         self, 
         user_message: str, 
         conversation_history: list[ChatMessage] | None
     ) -> list[BaseMessage]:
         """Build message list from conversation history."""
-        messages = []
-        
-        if conversation_history:
-            for msg in conversation_history:
-                if msg.role == "user":
-                    messages.append(HumanMessage(content=msg.content))
-                elif msg.role == "assistant":
-                    messages.append(AIMessage(content=msg.content))
-        
+        messages = [
+            _ROLE_CLS[msg["role"]](content=msg["content"])
+            for msg in (conversation_history or ())
+            if msg["role"] in _ROLE_CLS
+        ]
         messages.append(HumanMessage(content=user_message))
         return messages
     
-    def _get_system_prompt(self, selected_mcps: list[MCPType], available_tools: list[str] | None = None) -> str:
-        """Get system prompt based on available tools."""
-        if selected_mcps and available_tools:
-            tools_info = ", ".join(available_tools) if available_tools else "none"
-            mcps_info = ", ".join([mcp.value for mcp in selected_mcps])
-            return (
-                f"You currently have access to the following MCP servers: {mcps_info}. "
-                f"Available tools: {tools_info}. "
-                "IMPORTANT: Ignore any previous messages in the conversation history that say you don't have access to tools - "
-                "your tool access has been updated for this request. You DO have tools available now. "
-                "You can access the user's local files under /Users/mohitpaddhariya using filesystem tools (e.g., read_file, list_directory). "
-                "Do not say you cannot access local files; instead, invoke the appropriate tool. "
-                "Use the tools available to you to help the user with their request."
-            )
-        else:
-            return (
-                "You currently do not have access to any external tools or MCP servers. "
-                "If the user asks you to perform actions that require tools (like reading files, listing directories, etc.), "
-                "politely explain that no tools are currently selected and suggest they select the appropriate MCP tools from the sidebar."
-            )
+    def _system_message_for(
+        self,
+        selected_key: frozenset[MCPType],
+        tools_key: frozenset[str]
+    ) -> SystemMessage:
+        """Build a fresh system message from the cached prompt text."""
+        return SystemMessage(content=_system_prompt_for(selected_key, tools_key))
     
     async def run_agent(
         self,
         user_message: str,
         selected_mcps: list[MCPType],
         conversation_history: list[ChatMessage] | None = None
-    ) -> tuple[str, list[str]]:
+    ) -> tuple[str, list[str], dict[str, int]]:
         """
         Run the agent with selected MCP servers.
         
-        Uses MultiServerMCPClient to connect to multiple MCP servers via stdio.
+        Uses the persistent MCP sessions when available, otherwise a cached
+        MultiServerMCPClient connected to the MCP servers via stdio.
+        Returns the response, the tools used and the token usage.
         """
-        logger.info(f"[run_agent] Starting with message: {user_message[:50]}...")
-        logger.info(f"[run_agent] Selected MCPs: {selected_mcps}")
+        logger.info("[run_agent] Starting with selected MCPs: %s", selected_mcps)
         tools_used = []
+        usage = {"input_tokens": 0, "output_tokens": 0}
         
         # Build MCP config for selected servers
         mcp_config = get_mcp_server_config(selected_mcps)
-        logger.info(f"[run_agent] MCP config: {mcp_config}")
+        logger.debug("[run_agent] MCP config: %s", mcp_config)
         
         if not mcp_config:
             # No MCPs selected - run without tools
             logger.info("[run_agent] No MCPs - running without tools")
-            system_prompt = self._get_system_prompt([], None)
-            messages = [SystemMessage(content=system_prompt)] + self._build_messages(user_message, conversation_history)
+            messages = [self._system_message_for(frozenset(), frozenset())] + self._build_messages(user_message, conversation_history)
             response = await self.llm.ainvoke(messages)
-            logger.info(f"[run_agent] Response received: {response.content[:50]}...")
-            return response.content, []
+            logger.info("[run_agent] Response received")
+            _add_usage(usage, response)
+            return response.content, [], usage
         
-        # Use MultiServerMCPClient (creates new session per tool invocation)
-        logger.info("[run_agent] Creating MultiServerMCPClient...")
-        client = MultiServerMCPClient(mcp_config)
-        
-        # Get all tools from connected MCP servers
+        # Get all tools from MCP servers (persistent sessions or cached per selected-MCP set)
         logger.info("[run_agent] Getting tools from MCP servers...")
-        tools = await client.get_tools()
-        
-        # Enable error handling for all tools
-        for tool in tools:
-            tool.handle_tool_error = True
+        tools = await self._load_tools(selected_mcps, mcp_config)
         
         tool_names = [tool.name for tool in tools]
-        logger.info(f"[run_agent] Loaded {len(tools)} tools from MCP servers:")
-        for tool in tools:
-            logger.info(f"   - {tool.name}")
+        logger.info("[run_agent] Loaded %d tools from MCP servers", len(tools))
         
-        # Create ReAct agent with MCP tools
-        logger.info("[run_agent] Creating ReAct agent...")
-        agent = create_react_agent(
-            model=self.llm,
-            tools=tools,
-        )
+        # Get (cached) ReAct agent with MCP tools
+        agent = await self._get_agent(tools)
         
         # Build messages with system prompt prepended
-        system_prompt = self._get_system_prompt(selected_mcps, tool_names)
-        messages = [SystemMessage(content=system_prompt)] + self._build_messages(user_message, conversation_history)
+        system_message = self._system_message_for(frozenset(selected_mcps), frozenset(tool_names))
+        messages = [system_message] + self._build_messages(user_message, conversation_history)
         
         # Run the agent
         logger.info("[run_agent] Invoking agent...")
@@ -166,8 +524,9 @@ class MCPAgentBuilder:
         # Extract response and tools used
         final_messages = result.get("messages", [])
         
-        # Find tools that were called
+        # Find tools that were called and total the usage of every model call
         for msg in final_messages:
+            _add_usage(usage, msg)
             if hasattr(msg, "tool_calls") and msg.tool_calls:
                 for tool_call in msg.tool_calls:
                     tools_used.append(tool_call["name"])
@@ -176,10 +535,19 @@ class MCPAgentBuilder:
         last_message = final_messages[-1] if final_messages else None
         response_content = last_message.content if last_message else "No response generated."
         
-        logger.info(f"[run_agent] Tools used: {tools_used}")
-        logger.info(f"[run_agent] Response: {response_content[:100]}...")
+        logger.info("[run_agent] Tools used: %s", tools_used)
         
-        return response_content, tools_used
+        return response_content, tools_used, usage
+    
+    @staticmethod
+    def _buffer_token(buffer: _TokenBuffer, content: Any) -> list[Any]:
+        """Add streamed content to the buffer and return token contents ready to emit."""
+        if isinstance(content, str):
+            text = buffer.add(content)
+            return [text] if text is not None else []
+        # Non-text content (e.g. content blocks) is passed through unbuffered
+        pending = buffer.flush()
+        return [pending, content] if pending is not None else [content]
     
     async def stream_agent(
         self,
@@ -190,88 +558,105 @@ class MCPAgentBuilder:
         """
         Stream the agent's response with MCP tools.
         """
-        logger.info(f"[stream_agent] Starting with message: {user_message[:50]}...")
-        logger.info(f"[stream_agent] Selected MCPs: {selected_mcps}")
+        logger.info("[stream_agent] Starting with selected MCPs: %s", selected_mcps)
         
         # Build MCP config for selected servers
         mcp_config = get_mcp_server_config(selected_mcps)
-        logger.info(f"[stream_agent] MCP config: {mcp_config}")
+        logger.debug("[stream_agent] MCP config: %s", mcp_config)
         
         if not mcp_config:
             # No MCPs selected - stream without tools
             logger.info("[stream_agent] No MCPs - streaming without tools")
-            system_prompt = self._get_system_prompt([], None)
-            messages = [SystemMessage(content=system_prompt)] + self._build_messages(user_message, conversation_history)
-            async for chunk in self.llm.astream(messages):
+            messages = [self._system_message_for(frozenset(), frozenset())] + self._build_messages(user_message, conversation_history)
+            buffer = _TokenBuffer()
+            usage = {"input_tokens": 0, "output_tokens": 0}
+            async for chunk in _with_flush_deadline(self.llm.astream(messages), buffer):
+                if chunk is _FLUSH:
+                    if (text := buffer.flush()) is not None:
+                        yield {"type": "token", "content": text}
+                    continue
+                _add_usage(usage, chunk)
                 if chunk.content:
-                    yield {"type": "token", "content": chunk.content}
+                    for text in self._buffer_token(buffer, chunk.content):
+                        yield {"type": "token", "content": text}
+            if (text := buffer.flush()) is not None:
+                yield {"type": "token", "content": text}
             logger.info("[stream_agent] Stream complete (no tools)")
-            yield {"type": "done", "tools_used": []}
+            yield {"type": "done", "tools_used": [], "usage": usage}
             return
         
         tools_used = []
+        usage = {"input_tokens": 0, "output_tokens": 0}
         
-        # Use MultiServerMCPClient (creates new session per tool invocation)
-        logger.info("[stream_agent] Creating MultiServerMCPClient...")
-        client = MultiServerMCPClient(mcp_config)
+        # Get tools (persistent sessions or cached per selected-MCP set)
         logger.info("[stream_agent] Getting tools...")
-        tools = await client.get_tools()
-
-        # Enable error handling for all tools
-        for tool in tools:
-            tool.handle_tool_error = True
+        tools = await self._load_tools(selected_mcps, mcp_config)
 
         tool_names = [tool.name for tool in tools]
-        logger.info(f"[stream_agent] Loaded {len(tools)} tools")
+        logger.info("[stream_agent] Loaded %d tools", len(tools))
         
-        # Create ReAct agent
-        logger.info("[stream_agent] Creating ReAct agent...")
-        agent = create_react_agent(
-            model=self.llm,
-            tools=tools,
-        )
+        # Get (cached) ReAct agent with MCP tools
+        agent = await self._get_agent(tools)
         
         # Build messages with system prompt prepended
-        system_prompt = self._get_system_prompt(selected_mcps, tool_names)
-        messages = [SystemMessage(content=system_prompt)] + self._build_messages(user_message, conversation_history)
+        system_message = self._system_message_for(frozenset(selected_mcps), frozenset(tool_names))
+        messages = [system_message] + self._build_messages(user_message, conversation_history)
         
         # Stream agent execution
         logger.info("[stream_agent] Starting agent stream...")
-        async for event in agent.astream_events(
-            {"messages": messages},
-            version="v2"
+        buffer = _TokenBuffer()
+        async for event in _with_flush_deadline(
+            agent.astream_events({"messages": messages}, version="v2"),
+            buffer
         ):
+            if event is _FLUSH:
+                if (text := buffer.flush()) is not None:
+                    yield {"type": "token", "content": text}
+                continue
+            
             kind = event["event"]
-            logger.debug(f"[stream_agent] Event: {kind}")
             
             if kind == "on_chat_model_stream":
                 content = event["data"]["chunk"].content
                 if content:
-                    yield {"type": "token", "content": content}
+                    for text in self._buffer_token(buffer, content):
+                        yield {"type": "token", "content": text}
+                continue
+            
+            if kind == "on_chat_model_end":
+                _add_usage(usage, event["data"].get("output"))
+                continue
+            
+            if kind in ("on_tool_start", "on_tool_end"):
+                # Emit buffered text first so tool events stay in order
+                if (text := buffer.flush()) is not None:
+                    yield {"type": "token", "content": text}
             
-            elif kind == "on_tool_start":
+            if kind == "on_tool_start":
                 tool_name = event["name"]
                 tools_used.append(tool_name)
-                # Convert input to string to avoid serialization issues
+                # Serialize input once; the SSE layer splices these bytes in as-is
                 tool_input = event["data"].get("input", {})
                 try:
-                    # Try to serialize, if fails convert to string
-                    json.dumps(tool_input)
-                except (TypeError, ValueError):
-                    tool_input = str(tool_input)
+                    input_raw = orjson.dumps(tool_input)
+                except TypeError:
+                    # Not JSON-serializable - fall back to its string form
+                    input_raw = orjson.dumps(str(tool_input))
                 yield {
                     "type": "tool_start",
                     "tool": tool_name,
-                    "input": tool_input
+                    "input_raw": input_raw
                 }
             
             elif kind == "on_tool_end":
-                logger.info(f"[stream_agent] Tool ended: {event['name']}")
+                logger.info("[stream_agent] Tool ended: %s", event["name"])
                 yield {
                     "type": "tool_end",
                     "tool": event["name"],
-                    "output": str(event["data"].get("output", ""))[:500]
+                    "output": _preview(event["data"].get("output", ""))
                 }
         
-        logger.info(f"[stream_agent] Stream complete. Tools used: {tools_used}")
-        yield {"type": "done", "tools_used": tools_used}
+        if (text := buffer.flush()) is not None:
+            yield {"type": "token", "content": text}
+        logger.info("[stream_agent] Stream complete. Tools used: %s", tools_used)
+        yield {"type": "done", "tools_used": tools_used, "usage": usage}
@@ -1,11 +1,27 @@
 """Configuration for the backend application."""
 
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from typing import Optional
 
 
-class Settings(BaseSettings):
+class CORSSettings(BaseSettings):
+    """CORS settings, readable without the rest of the application config."""
+    
+    # CORS - origins allowed to call the API (JSON list, e.g. ["*"] for any)
+    allowed_origins: list[str] = Field(
+        default=["http://localhost:3000", "http://127.0.0.1:3000"],
+        alias="ALLOWED_ORIGINS"
+    )
+    
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+class Settings(CORSSettings):
     """Application settings loaded from environment variables."""
     
     # API Keys
@@ -23,12 +39,15 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = Field(default="0.0.0.0", alias="HOST")
     port: int = Field(default=8000, alias="PORT")
-    
-    class Config:
-        env_file = ".env"
-        extra = "ignore"
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get application settings."""
+    """Get application settings (loaded once and shared)."""
     return Settings()
+
+
+@lru_cache(maxsize=1)
+def get_cors_settings() -> CORSSettings:
+    """Get CORS settings without requiring the API key to be set."""
+    return CORSSettings()
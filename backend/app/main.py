@@ -1,6 +1,5 @@
 """FastAPI main application with chat endpoints."""
 
-import json
 import logging
 from contextlib import asynccontextmanager
 
@@ -8,13 +7,15 @@ from contextlib import asynccontextmanager
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI, HTTPException, status
+import orjson
+from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse
 from sse_starlette.sse import EventSourceResponse
 from dotenv import load_dotenv
 
-from app.config import get_settings
+from app.config import get_cors_settings, get_settings
 from app.schemas import (
     ChatRequest,
     ChatResponse,
@@ -22,8 +23,7 @@ from app.schemas import (
     MCPInfo,
     MCPType,
 )
-from app.agent import MCPAgentBuilder, get_mcp_server_config
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from app.agent import MCPAgentBuilder, PersistentMCPClient
 
 # Load environment variables
 load_dotenv()
@@ -38,27 +38,151 @@ async def lifespan(app: FastAPI):
     print(f"📦 Model: {settings.model_name}")
     print(f"🔌 Using langchain-mcp-adapters for MCP integration")
     print(f"🔌 MCP servers will be spawned as subprocesses (stdio transport)")
-    yield
-    # Shutdown
-    print("👋 Shutting down...")
+    
+    # Keep one MCP session per server open for the application lifetime,
+    # spawning all servers in parallel so startup costs max(t_i), not sum(t_i)
+    mcp_client = PersistentMCPClient(list(MCPType))
+    app.state.mcp_client = mcp_client
+    try:
+        await mcp_client.connect()
+        
+        # Shared agent builder (and LLM client) for all requests
+        app.state.agent_builder = MCPAgentBuilder(
+            model_name=settings.model_name,
+            google_api_key=settings.google_api_key,
+            mcp_client=mcp_client
+        )
+        yield
+    finally:
+        # Shutdown - also runs if startup fails, so MCP subprocesses never leak
+        print("👋 Shutting down...")
+        await mcp_client.disconnect()
 
 
 app = FastAPI(
     title="LangGraph MCP Backend",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# CORS middleware for frontend
+# CORS middleware for frontend, registered before any routes. Credentials
+# cannot be combined with a wildcard origin, so they are only allowed for
+# an explicit origin list.
+allowed_origins = get_cors_settings().allowed_origins
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
+    allow_origins=allowed_origins,
+    allow_credentials="*" not in allowed_origins,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
 
+def _schema_examples() -> dict[str, dict]:
+    """Examples for the OpenAPI component schemas, built only when docs are generated."""
+    return {
+        "ChatMessage": {
+            "properties": {
+                "role": ["user", "assistant"],
+                "content": ["Hello, how can you help me?", "I can help you with file operations!"],
+            },
+            "examples": [
+                {"role": "user", "content": "List all Python files in my project"},
+                {"role": "assistant", "content": "I found 5 Python files in your project..."}
+            ],
+        },
+        "ChatRequest": {
+            "properties": {
+                "message": ["List the files in my home directory", "Read the content of README.md"],
+                "selected_mcps": [["filesystem"], []],
+            },
+            "examples": [
+                {
+                    "message": "What is 2 + 2?",
+                    "selected_mcps": [],
+                    "conversation_history": []
+                },
+                {
+                    "message": "List the files in /Users/mohit/projects",
+                    "selected_mcps": ["filesystem"],
+                    "conversation_history": []
+                },
+                {
+                    "message": "Now read the README.md file",
+                    "selected_mcps": ["filesystem"],
+                    "conversation_history": [
+                        {"role": "user", "content": "List the files in /Users/mohit/projects"},
+                        {"role": "assistant", "content": "Found: README.md, main.py, requirements.txt"}
+                    ]
+                }
+            ],
+        },
+        "ChatResponse": {
+            "properties": {
+                "tools_used": [[], ["list_directory"], ["read_file", "write_file"]],
+            },
+            "examples": [
+                {
+                    "response": "2 + 2 = 4",
+                    "tools_used": [],
+                    "usage": {"input_tokens": 42, "output_tokens": 7}
+                },
+                {
+                    "response": "The directory contains: main.py, README.md, requirements.txt",
+                    "tools_used": ["list_directory"],
+                    "usage": {"input_tokens": 512, "output_tokens": 64}
+                }
+            ],
+        },
+        "HealthResponse": {
+            "properties": {"status": ["ok", "degraded"]},
+            "examples": [{"status": "ok", "version": "0.1.0"}],
+        },
+        "MCPInfo": {
+            "properties": {
+                "name": ["filesystem"],
+                "tools": [["read_file", "write_file", "list_directory"]],
+            },
+            "examples": [
+                {
+                    "name": "filesystem",
+                    "type": "filesystem",
+                    "url": None,
+                    "available": True,
+                    "tools": ["read_file", "write_file", "list_directory", "search_files"]
+                }
+            ],
+        },
+    }
+
+
+def custom_openapi() -> dict:
+    """Generate the OpenAPI schema on first request, with examples attached."""
+    if app.openapi_schema:
+        return app.openapi_schema
+    
+    openapi_schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        routes=app.routes,
+    )
+    schemas = openapi_schema.get("components", {}).get("schemas", {})
+    for name, extra in _schema_examples().items():
+        schema = schemas.get(name)
+        if schema is None:
+            continue
+        schema["examples"] = extra["examples"]
+        for field, examples in extra["properties"].items():
+            schema["properties"][field]["examples"] = examples
+    
+    app.openapi_schema = openapi_schema
+    return app.openapi_schema
+
+
+app.openapi = custom_openapi
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Check API health and version."""
@@ -66,86 +190,78 @@ async def health_check():
 
 
 @app.get("/mcps", response_model=list[MCPInfo])
-async def list_mcps():
+async def list_mcps(request: Request):
     """List all available MCP servers."""
-    mcps = []
+    mcp_client = request.app.state.mcp_client
     
+    mcps = []
     for mcp_type in MCPType:
-        # Get MCP config
-        config = get_mcp_server_config([mcp_type])
-        
-        mcp_info = MCPInfo(
+        # None while the server's session is down; the heartbeat keeps this live
+        tools = mcp_client.get_tools([mcp_type])
+        mcps.append(MCPInfo(
             name=mcp_type.value,
             type=mcp_type,
             url=None,  # Using stdio, not HTTP
-            available=False,
-            tools=[]
-        )
-        
-        # Try to connect and get tools
-        try:
-            client = MultiServerMCPClient(config)
-            tools = await client.get_tools()
-            mcp_info.tools = [tool.name for tool in tools]
-            mcp_info.available = True
-        except Exception as e:
-            print(f"Failed to get tools for {mcp_type.value}: {e}")
-            mcp_info.available = False
-        
-        mcps.append(mcp_info)
+            available=tools is not None,
+            tools=[tool.name for tool in tools or []]
+        ))
     
     return mcps
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """Send a message to the AI agent and get a response."""
-    logger.info(f"[/chat] Received message: {request.message}")
-    logger.info(f"[/chat] Selected MCPs: {request.selected_mcps}")
-    
-    settings = get_settings()
+    logger.info("[/chat] Received message. Selected MCPs: %s", request.selected_mcps)
     
-    # Build and run agent with MultiMCP
-    agent_builder = MCPAgentBuilder(
-        model_name=settings.model_name,
-        google_api_key=settings.google_api_key
-    )
+    agent_builder = http_request.app.state.agent_builder
     
     try:
         logger.info("[/chat] Running agent...")
-        response, tools_used = await agent_builder.run_agent(
+        response, tools_used, usage = await agent_builder.run_agent(
             user_message=request.message,
             selected_mcps=request.selected_mcps,
             conversation_history=request.conversation_history
         )
         
-        logger.info(f"[/chat] Agent completed. Tools used: {tools_used}")
+        logger.info("[/chat] Agent completed. Tools used: %s", tools_used)
         return ChatResponse(
             response=response,
-            tools_used=tools_used
+            tools_used=tools_used,
+            usage=usage
         )
     
     except Exception as e:
-        logger.error(f"[/chat] Agent execution failed: {str(e)}", exc_info=True)
+        logger.error("[/chat] Agent execution failed: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Agent execution failed: {str(e)}"
         )
 
 
+# Pre-serialized envelope for token events, the bulk of every stream
+_TOKEN_EVENT_PREFIX = '{"type":"token","content":'
+
+
+def _encode_event(event: dict) -> str:
+    """Serialize a stream event to JSON for the SSE data field."""
+    if event["type"] == "token":
+        return _TOKEN_EVENT_PREFIX + orjson.dumps(event["content"]).decode() + "}"
+    if event["type"] == "tool_start":
+        # Tool input arrives already serialized by the agent
+        return (
+            '{"type":"tool_start","tool":' + orjson.dumps(event["tool"]).decode()
+            + ',"input":' + event["input_raw"].decode() + "}"
+        )
+    return orjson.dumps(event).decode()
+
+
 @app.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
     """Stream a chat response using Server-Sent Events (SSE)."""
-    logger.info(f"[/chat/stream] Received message: {request.message}")
-    logger.info(f"[/chat/stream] Selected MCPs: {request.selected_mcps}")
-    
-    settings = get_settings()
+    logger.info("[/chat/stream] Received message. Selected MCPs: %s", request.selected_mcps)
     
-    # Build agent
-    agent_builder = MCPAgentBuilder(
-        model_name=settings.model_name,
-        google_api_key=settings.google_api_key
-    )
+    agent_builder = http_request.app.state.agent_builder
     
     async def event_generator():
         """Generate SSE events from agent stream."""
@@ -156,17 +272,16 @@ async def chat_stream(request: ChatRequest):
                 selected_mcps=request.selected_mcps,
                 conversation_history=request.conversation_history
             ):
-                logger.info(f"[/chat/stream] Event: {event['type']}")
                 yield {
                     "event": event["type"],
-                    "data": json.dumps(event)
+                    "data": _encode_event(event)
                 }
             logger.info("[/chat/stream] Stream completed")
         except Exception as e:
-            logger.error(f"[/chat/stream] Stream error: {str(e)}", exc_info=True)
+            logger.error("[/chat/stream] Stream error: %s", e, exc_info=True)
             yield {
                 "event": "error",
-                "data": json.dumps({"type": "error", "message": str(e)})
+                "data": orjson.dumps({"type": "error", "message": str(e)}).decode()
             }
     
     return EventSourceResponse(event_generator())
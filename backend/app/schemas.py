@@ -1,7 +1,7 @@
 """Pydantic schemas for request/response models."""
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, TypedDict
 from enum import Enum
 
 
@@ -15,31 +15,19 @@ class MCPType(str, Enum):
     FILESYSTEM = "filesystem"
 
 
-class ChatMessage(BaseModel):
+class ChatMessage(TypedDict):
     """
     A single message in the conversation history.
     
-    Used to maintain context across multiple chat turns.
-    """
-    role: str = Field(
-        ..., 
-        description="Role of the message sender. Must be 'user' or 'assistant'",
-        json_schema_extra={"examples": ["user", "assistant"]}
-    )
-    content: str = Field(
-        ..., 
-        description="The text content of the message",
-        json_schema_extra={"examples": ["Hello, how can you help me?", "I can help you with file operations!"]}
-    )
+    Used to maintain context across multiple chat turns. A TypedDict rather
+    than a model, so long histories are validated without building one
+    object per message; extra keys are ignored.
     
-    model_config = {
-        "json_schema_extra": {
-            "examples": [
-                {"role": "user", "content": "List all Python files in my project"},
-                {"role": "assistant", "content": "I found 5 Python files in your project..."}
-            ]
-        }
-    }
+    - role: Role of the message sender. Must be 'user' or 'assistant'
+    - content: The text content of the message
+    """
+    role: str
+    content: str
 
 
 class ChatRequest(BaseModel):
@@ -53,43 +41,32 @@ class ChatRequest(BaseModel):
         ..., 
         description="The user's message or question to the AI agent",
         min_length=1,
-        max_length=10000,
-        json_schema_extra={"examples": ["List the files in my home directory", "Read the content of README.md"]}
+        max_length=10000
     )
     selected_mcps: list[MCPType] = Field(
         default_factory=list,
-        description="List of MCP servers to enable for this request. Leave empty for chat without tools.",
-        json_schema_extra={"examples": [["filesystem"], ["filesystem", "s3"], []]}
+        description="List of MCP servers to enable for this request. Leave empty for chat without tools."
     )
     conversation_history: list[ChatMessage] = Field(
         default_factory=list,
         description="Previous messages in the conversation for context. Most recent messages should be at the end."
     )
+
+
+class TokenUsage(BaseModel):
+    """
+    LLM token usage for a single request.
     
-    model_config = {
-        "json_schema_extra": {
-            "examples": [
-                {
-                    "message": "What is 2 + 2?",
-                    "selected_mcps": [],
-                    "conversation_history": []
-                },
-                {
-                    "message": "List the files in /Users/mohit/projects",
-                    "selected_mcps": ["filesystem"],
-                    "conversation_history": []
-                },
-                {
-                    "message": "Now read the README.md file",
-                    "selected_mcps": ["filesystem"],
-                    "conversation_history": [
-                        {"role": "user", "content": "List the files in /Users/mohit/projects"},
-                        {"role": "assistant", "content": "Found: README.md, main.py, requirements.txt"}
-                    ]
-                }
-            ]
-        }
-    }
+    Summed over every model call the agent made while answering.
+    """
+    input_tokens: int = Field(
+        default=0,
+        description="Number of prompt tokens sent to the model"
+    )
+    output_tokens: int = Field(
+        default=0,
+        description="Number of tokens generated by the model"
+    )
 
 
 class ChatResponse(BaseModel):
@@ -104,24 +81,12 @@ class ChatResponse(BaseModel):
     )
     tools_used: list[str] = Field(
         default_factory=list,
-        description="List of MCP tool names that were invoked during this request",
-        json_schema_extra={"examples": [[], ["list_directory"], ["read_file", "write_file"]]}
+        description="List of MCP tool names that were invoked during this request"
+    )
+    usage: TokenUsage = Field(
+        default_factory=TokenUsage,
+        description="Token usage reported by the model for this request"
     )
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [
-                {
-                    "response": "2 + 2 = 4",
-                    "tools_used": []
-                },
-                {
-                    "response": "The directory contains: main.py, README.md, requirements.txt",
-                    "tools_used": ["list_directory"]
-                }
-            ]
-        }
-    }
 
 
 class HealthResponse(BaseModel):
@@ -130,21 +95,12 @@ class HealthResponse(BaseModel):
     """
     status: str = Field(
         default="ok", 
-        description="Current health status of the API",
-        json_schema_extra={"examples": ["ok", "degraded"]}
+        description="Current health status of the API"
     )
     version: str = Field(
         default="0.1.0", 
         description="Current API version"
     )
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [
-                {"status": "ok", "version": "0.1.0"}
-            ]
-        }
-    }
 
 
 class MCPInfo(BaseModel):
@@ -155,8 +111,7 @@ class MCPInfo(BaseModel):
     """
     name: str = Field(
         ..., 
-        description="Display name of the MCP server",
-        json_schema_extra={"examples": ["filesystem", "s3"]}
+        description="Display name of the MCP server"
     )
     type: MCPType = Field(
         ..., 
@@ -172,23 +127,8 @@ class MCPInfo(BaseModel):
     )
     tools: list[str] = Field(
         default_factory=list,
-        description="List of tool names provided by this MCP server (populated when connected)",
-        json_schema_extra={"examples": [["read_file", "write_file", "list_directory"]]}
+        description="List of tool names provided by this MCP server (populated when connected)"
     )
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [
-                {
-                    "name": "filesystem",
-                    "type": "filesystem",
-                    "url": None,
-                    "available": True,
-                    "tools": ["read_file", "write_file", "list_directory", "search_files"]
-                }
-            ]
-        }
-    }
 
 
 # Streaming event models for documentation
@@ -196,12 +136,6 @@ class StreamTokenEvent(BaseModel):
     """SSE event containing a token from the AI response stream."""
     type: str = Field(default="token", description="Event type identifier")
     content: str = Field(..., description="The token content being streamed")
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [{"type": "token", "content": "Hello"}]
-        }
-    }
 
 
 class StreamToolStartEvent(BaseModel):
@@ -209,12 +143,6 @@ class StreamToolStartEvent(BaseModel):
     type: str = Field(default="tool_start", description="Event type identifier")
     tool: str = Field(..., description="Name of the tool being executed")
     input: dict = Field(default_factory=dict, description="Input arguments passed to the tool")
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [{"type": "tool_start", "tool": "list_directory", "input": {"path": "/Users/mohit"}}]
-        }
-    }
 
 
 class StreamToolEndEvent(BaseModel):
@@ -222,33 +150,16 @@ class StreamToolEndEvent(BaseModel):
     type: str = Field(default="tool_end", description="Event type identifier")
     tool: str = Field(..., description="Name of the tool that completed")
     output: str = Field(..., description="Output/result from the tool execution")
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [{"type": "tool_end", "tool": "list_directory", "output": "[\"file1.txt\", \"file2.py\"]"}]
-        }
-    }
 
 
 class StreamDoneEvent(BaseModel):
     """SSE event indicating the stream has completed."""
     type: str = Field(default="done", description="Event type identifier")
     tools_used: list[str] = Field(default_factory=list, description="List of all tools used during this request")
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [{"type": "done", "tools_used": ["list_directory", "read_file"]}]
-        }
-    }
+    usage: TokenUsage = Field(default_factory=TokenUsage, description="Token usage reported by the model for this request")
 
 
 class StreamErrorEvent(BaseModel):
     """SSE event indicating an error occurred."""
     type: str = Field(default="error", description="Event type identifier")
     message: str = Field(..., description="Error message describing what went wrong")
-    
-    model_config = {
-        "json_schema_extra": {
-            "examples": [{"type": "error", "message": "Failed to connect to MCP server"}]
-        }
-    }
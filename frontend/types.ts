@@ -17,9 +17,15 @@ export interface ChatRequest {
   conversation_history?: ChatMessage[];
 }
 
+export interface TokenUsage {
+  input_tokens: number;
+  output_tokens: number;
+}
+
 export interface ChatResponse {
   response: string;
   tools_used: string[];
+  usage?: TokenUsage;
 }
 
 export interface StreamEvent {
@@ -29,4 +35,5 @@ export interface StreamEvent {
   input?: any;
   output?: any;
   tools_used?: string[];
+  usage?: TokenUsage;
 }